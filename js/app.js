@@ -1,6 +1,7 @@
 // app.js — Main application controller
 
 import { state } from './state.js';
+import { inflateDiffs } from './utils.js';
 import { renderSections } from './table.js';
 import { drawGeometry } from './map.js';
 import { makeResizable, openHelpModal, closeHelpModal, saveSession, loadSession, exportToExcel, exportToShapefile, openDetail, closeModal, updateFileName, openCompareModal, closeCompareModal, setWorker, setSetStatusCallback, initTheme, toggleTheme } from './ui.js';
@@ -41,7 +42,7 @@ worker.onmessage = (ev) => {
   }
   if (type === "result") {
     try {
-      const json = JSON.parse(payload);
+      const json = inflateDiffs(JSON.parse(payload));
       state.LAST.json = json;
       renderSections(json);
       drawGeometry(json);
@@ -1,7 +1,7 @@
 // ui.js — UI interactions, modals, session management, export
 
 import { state } from './state.js';
-import { abToB64, b64ToAb, escapeHtml, relabelHeaders } from './utils.js';
+import { abToB64, b64ToAb, escapeHtml, relabelHeaders, inflateDiffs } from './utils.js';
 import { renderSections } from './table.js';
 import { drawGeometry } from './map.js';
 
@@ -1132,6 +1132,7 @@ export function applyUIState(ui) {
 }
 
 export async function restoreFromResult(result, ui) {
+  result = inflateDiffs(result);
   state.LAST.json = result;
   applyUIState(ui);
   renderSections(result);
@@ -1379,7 +1380,8 @@ export async function exportToShapefile() {
       diffs: JSON.stringify(state.LAST.json),
       geometry: "{}",
       crs: state.CURRENT_CRS,
-      filePrefix: filePrefix
+      filePrefix: filePrefix,
+      includeUnchanged: document.getElementById('shpIncludeUnchanged')?.checked || false
     });
   }
 }
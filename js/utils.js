@@ -59,3 +59,32 @@ export function relabelHeaders(section, hdrs) {
   return hdrs.map(h => MAP[h] ?? h);
 }
 
+
+// Expand ID-list added/removed entries into { id: values } maps, looking the
+// rows up in sections1/sections2. Already-expanded results pass through as-is.
+export function inflateDiffs(json) {
+  if (!json || !json.diffs) return json;
+  const diffs = {};
+  for (const [sec, d] of Object.entries(json.diffs)) {
+    if (!Array.isArray(d.added) && !Array.isArray(d.removed)) {
+      diffs[sec] = d;
+      continue;
+    }
+    const padNA = (json.headers?.[sec] || []).includes("New Name");
+    const lookup = (sections, ids) => {
+      const src = sections?.[sec] || {};
+      const out = {};
+      for (const id of ids) {
+        const vals = src[id] || [];
+        out[id] = padNA ? ["NA", ...vals] : vals;
+      }
+      return out;
+    };
+    diffs[sec] = {
+      ...d,
+      added: Array.isArray(d.added) ? lookup(json.sections2, d.added) : d.added,
+      removed: Array.isArray(d.removed) ? lookup(json.sections1, d.removed) : d.removed
+    };
+  }
+  return { ...json, diffs };
+}
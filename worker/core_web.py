@@ -5,15 +5,29 @@
 # ═══════════════════════════════════════════════════════════════════════════════
 
 from __future__ import annotations
-import io, re, json, math
+import io, re, json, math, sys, hashlib
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple, Optional
-from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Tuple, Optional
+from collections import defaultdict, OrderedDict
+from collections.abc import Mapping
+from types import MappingProxyType
 import zipfile
 import shapefile
 
+try:
+    import orjson  # optional C encoder; not loaded in the Pyodide worker
+except ImportError:
+    orjson = None
+
 MAP_SOURCE_CRS = "EPSG:3735"  # Default CRS; reprojected client-side via proj4
 
+# Precompiled patterns for the per-line parser loops
+_RE_DOUBLE_WS = re.compile(r"\s{2,}")  # column separators in `;;` header lines
+_RE_NON_ALNUM = re.compile(r"[^a-zA-Z0-9]")
+
+_EMPTY = ()  # shared read-only default for missing rows; serializes as []
+_EMPTY_MAP = MappingProxyType({})  # shared read-only default for missing sections
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # SECTION 2: SECTION HEADER DEFINITIONS
@@ -23,15 +37,15 @@ MAP_SOURCE_CRS = "EPSG:3735"  # Default CRS; reprojected client-side via proj4
 
 SECTION_HEADERS = {
     # --- Project / Config ---
-    "TITLE": [],
+    "TITLE": (),
 
-    "OPTIONS": ["Option", "Value"],
+    "OPTIONS": ("Option", "Value"),
 
-    "REPORT": ["Keyword", "Value1", "Value2", "Value3"],
+    "REPORT": ("Keyword", "Value1", "Value2", "Value3"),
 
-    #"FILES": ["Action", "FileType", "FileName"],  # USE/SAVE, RAINFALL/RUNOFF/etc.
+    #"FILES": ("Action", "FileType", "FileName"),  # USE/SAVE, RAINFALL/RUNOFF/etc.
 
-    "RAINGAGES": [
+    "RAINGAGES": (
         "Name",       # Name
         "Format",     # INTENSITY / VOLUME / CUMULATIVE
         "Interval",   # Intvl
@@ -40,28 +54,28 @@ SECTION_HEADERS = {
         "SourceName", # Tseries or Fname
         "Station",    # Sta (optional)
         "Units",      # IN / MM (optional)
-    ],
+    ),
 
-    "EVAPORATION": [
+    "EVAPORATION": (
         "Keyword",    # CONSTANT / MONTHLY / TIMESERIES / TEMPERATURE / FILE / RECOVERY / DRY_ONLY
         "Value1", "Value2", "Value3", "Value4", "Value5", "Value6",
         "Value7", "Value8", "Value9", "Value10", "Value11", "Value12"
-    ],
+    ),
 
-    "TEMPERATURE": [
+    "TEMPERATURE": (
         "Keyword",    # TIMESERIES / FILE / WINDSPEED / SNOWMELT / ADC
         "Arg1", "Arg2", "Arg3", "Arg4", "Arg5", "Arg6",
         "Arg7", "Arg8", "Arg9", "Arg10", "Arg11", "Arg12", "Arg13"
-    ],
+    ),
 
-    "ADJUSTMENTS": [
+    "ADJUSTMENTS": (
         "Variable",   # TEMPERATURE / EVAPORATION / RAINFALL / CONDUCTIVITY
         "Jan", "Feb", "Mar", "Apr", "May", "Jun",
         "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"
-    ],
+    ),
 
     # --- Hydrology ---
-    "SUBCATCHMENTS": [
+    "SUBCATCHMENTS": (
         "Name",
         "RainGage",    # Rgage
         "Outlet",      # OutID
@@ -71,9 +85,9 @@ SECTION_HEADERS = {
         "Slope",
         "CurbLength",  # Clength
         "SnowPack"     # Spack (optional)
-    ],
+    ),
 
-    "SUBAREAS": [
+    "SUBAREAS": (
         "Subcatch",
         "N_Imperv",    # Nimp
         "N_Perv",      # Nperv
@@ -82,21 +96,21 @@ SECTION_HEADERS = {
         "PctZeroStor", # %Zero
         "RouteTo",
         "PctRouted"    # %Routed (optional)
-    ],
+    ),
 
-    "INFILTRATION": [
+    "INFILTRATION": (
         "Subcatch",
         "Max. Infil. Rate", "Min. Infil. Rate", "Decay Constant", "Drying Time", "Max Volume",  # Interpretation depends on method
         "Method"                       # optional override
-    ],
+    ),
 
-    "LID_CONTROLS": [
+    "LID_CONTROLS": (
         "Name",
         "Type",        # BC/IT/PP/VS/RG/RD
         "Layers"
-    ],
+    ),
 
-    "LID_USAGE": [
+    "LID_USAGE": (
         "Subcatch",
         "LID",
         "Number",
@@ -108,9 +122,9 @@ SECTION_HEADERS = {
         "RptFile",
         "DrainTo",
         "FromPerv"
-    ],
+    ),
 
-    "AQUIFERS": [
+    "AQUIFERS": (
         "Name",
         "Porosity",    # Por
         "WiltPoint",   # WP
@@ -125,9 +139,9 @@ SECTION_HEADERS = {
         "InitGWTable", # Egw
         "InitUmc",     # Umc
         "EvapPattern"  # Epat (optional)
-    ],
+    ),
 
-    "GROUNDWATER": [
+    "GROUNDWATER": (
         "Subcatch",
         "Aquifer",
         "Node",
@@ -140,14 +154,14 @@ SECTION_HEADERS = {
         "Ebot",
         "Egw",
         "Umc"
-    ],
+    ),
 
-    "GWF": [
+    "GWF": (
         "Subcatch",
         "Expression"    # full math expression string
-    ],
+    ),
 
-    "SNOWPACKS": [
+    "SNOWPACKS": (
         "Name",
         "Subcatch",    # or * for global
         "Pliquid",
@@ -160,36 +174,36 @@ SECTION_HEADERS = {
         "Tbase",
         "Fmf", "Umlt",
         "FImin", "FImax"
-    ],
+    ),
 
     # --- Nodes / Links ---
-    "JUNCTIONS": [
+    "JUNCTIONS": (
         "Name",
         "InvertElev",   # Invert
         "MaxDepth",
         "InitDepth",
         "SurchargeDepth",
         "PondedArea"
-    ],
+    ),
 
-    "OUTFALLS": [
+    "OUTFALLS": (
         "Name",
         "InvertElev",
         "Type",         # FREE / NORMAL / FIXED / TIDAL / TIMESERIES / ROUTED
         "StageData",    # fixed elev, tidals, timeseries name, or receiving node
         "TideGate",
         "RouteTo"
-    ],
+    ),
 
-    "DIVIDERS": [
+    "DIVIDERS": (
         "Name",
         "Elevation",         # Inlet node
         "Diverted Link",         # Main conduit
         "Type",         # CUTOFF / OVERFLOW / TABULAR / WEIR / CUSTOM
         "P1", "P2", "P3", "P4", "P5"
-    ],
+    ),
 
-    "STORAGE": [
+    "STORAGE": (
         "Name",
         "InvertElev",
         "MaxDepth",
@@ -202,9 +216,9 @@ SECTION_HEADERS = {
         "EvapFactor",
         "SeepageRate",
         "Fevap"
-    ],
+    ),
 
-    "CONDUITS": [
+    "CONDUITS": (
         "Name",
         "FromNode",
         "ToNode",
@@ -214,9 +228,9 @@ SECTION_HEADERS = {
         "OutOffset",
         "InitFlow",
         "MaxFlow"
-    ],
+    ),
 
-    "PUMPS": [
+    "PUMPS": (
         "Name",
         "FromNode",
         "ToNode",
@@ -224,9 +238,9 @@ SECTION_HEADERS = {
         "Status",       # ON/OFF
         "StartupDepth",
         "ShutoffDepth"
-    ],
+    ),
 
-    "ORIFICES": [
+    "ORIFICES": (
         "Name",
         "FromNode",
         "ToNode",
@@ -235,9 +249,9 @@ SECTION_HEADERS = {
         "OrificeCoeff",
         "FlapGate",
         "OpenCloseTime"
-    ],
+    ),
 
-    "WEIRS": [
+    "WEIRS": (
         "Name",
         "FromNode",
         "ToNode",
@@ -247,9 +261,9 @@ SECTION_HEADERS = {
         "FlapGate",
         "EndCon",
         "CdDischarge"   # plus a few extras depending on type; treat as generic last col
-    ],
+    ),
 
-    "OUTLETS": [
+    "OUTLETS": (
         "Name",
         "FromNode",
         "ToNode",
@@ -257,9 +271,9 @@ SECTION_HEADERS = {
         "Curve",
         "FlapGate",
         "Seepage"
-    ],
+    ),
 
-    "XSECTIONS": [
+    "XSECTIONS": (
         "Link",
         "Shape",
         "Geom1",
@@ -268,16 +282,16 @@ SECTION_HEADERS = {
         "Geom4",
         "Barrels",
         "CulvertCode"
-    ],
+    ),
 
-    "TRANSECTS": [
+    "TRANSECTS": (
         "TransectID",
         "nLeft", "nRight", "nChan",
         "XLeft", "XRight",
         "Lfactor", "Wfactor", "Eoffset"
-    ],
+    ),
 
-    "STREETS": [
+    "STREETS": (
         "Name",
         "Tcrown",
         "Hcurb",           # gutter slopes
@@ -289,16 +303,16 @@ SECTION_HEADERS = {
         "Tback",
         "Sback",
         "nBack"
-    ],
+    ),
 
-    "INLETS": [
+    "INLETS": (
         "Name",
         "Type",         # GRATE/CURB/COMBO/BYPASS/...
         "Param1", "Param2", "Param3", "Param4",
         "Param5", "Param6", "Param7", "Param8"
-    ],
+    ),
 
-    "INLET_USAGE": [
+    "INLET_USAGE": (
         "Conduit",
         "Inlet",
         "Node",    
@@ -308,19 +322,19 @@ SECTION_HEADERS = {
         "aLocal",
         "wLocal",
         "Placement"
-    ],
+    ),
 
-    "LOSSES": [
+    "LOSSES": (
         "Link",
         "Kentry",
         "Kexit",
         "Kavg",
         "FlapGate",
         "Seepage"
-    ],
+    ),
 
     # --- Water Quality / Land Use ---
-    "POLLUTANTS": [
+    "POLLUTANTS": (
         "Name",
         "Units",
         "Crain",         # Crain
@@ -332,23 +346,23 @@ SECTION_HEADERS = {
         "CoFrac",
         "Cdwf",
         "Cinit"
-    ],
+    ),
 
-    "LANDUSES": [
+    "LANDUSES": (
         "Name",
         "SweepInterval",
         "Availability",
         "LastSweepDays",
         "StreetSweepEff"
-    ],
+    ),
 
-    "COVERAGES": [
+    "COVERAGES": (
         "Subcatch",
         "LandUse",
         "Percent"
-    ],
+    ),
 
-    "BUILDUP": [
+    "BUILDUP": (
         "LandUse",
         "Pollutant",
         "FuncType",     # POWER/EXPONENTIAL/SATURATION/EMC/RATING
@@ -356,9 +370,9 @@ SECTION_HEADERS = {
         "Coeff2",
         "Coeff3",
         "PerUnit"
-    ],
+    ),
 
-    "WASHOFF": [
+    "WASHOFF": (
         "LandUse",
         "Pollutant",
         "FuncType",     # EXPONENTIAL/EMC/RATING
@@ -366,16 +380,16 @@ SECTION_HEADERS = {
         "Coeff2",
         "SweepRemoval",
         "BMPRemoval"
-    ],
+    ),
 
-    "TREATMENT": [
+    "TREATMENT": (
         "NodeOrOutfall",
         "Pollutant",
         "Expression"
-    ],
+    ),
 
     # --- Inflows / DWF / RDII ---
-    "INFLOWS": [
+    "INFLOWS": (
         "Node",
         "Constituent",       # FLOW or pollutant name
         "TimeSeries",
@@ -384,29 +398,29 @@ SECTION_HEADERS = {
         "Sfactor",
         "Baseline",
         "Pattern"
-    ],
+    ),
 
-    "DWF": [
+    "DWF": (
         "Node",
         "Constituent",  # FLOW or pollutant name
         "Average Value", "Time Pattern 1", "Time Pattern 2", "Time Pattern 3", "Time Pattern 4"
-    ],
+    ),
 
-    "RDII": [
+    "RDII": (
         "Node",
         "UnitHyd",
         "SewerArea"
-    ],
+    ),
 
-    "UNITHYD": [
+    "UNITHYD": (
         "Name",
         "RainGage",
         "Month",
         "Response",     # SHORT/MEDIUM/LONG
         "R", "T", "K"
-    ],
+    ),
 
-    "HYDROGRAPHS": [
+    "HYDROGRAPHS": (
         
         "Hydrograph",
         "Month",
@@ -418,81 +432,92 @@ SECTION_HEADERS = {
         "Drecov",
         "Dinit",
         "RainGage"
-    ],
+    ),
 
-    "LOADINGS": [
+    "LOADINGS": (
         "Subcatch",
         "Pollutant",
         "InitBuildup"
-    ],
+    ),
 
     # --- Curves / Patterns / Timeseries ---
-    "CURVES": [
+    "CURVES": (
         "CurveID",
         "Type",
         "Data"
-    ],
+    ),
 
-    "TIMESERIES": [
+    "TIMESERIES": (
         "Name",
         "Date",
         "Time",
         "Value",
         "FileName"
-    ],
+    ),
 
 
 
     # --- Controls / Tags / Geometry ---
-    "CONTROLS": [
+    "CONTROLS": (
         # Not really tabular – control rules are free-form:
-        "RuleText"
-    ],
+        "RuleText",
+    ),
 
-    "TAGS": [
+    "TAGS": (
         "Type",
         "ID",
         "Tag"
-    ],
+    ),
 
     # Map/geometry sections (often at bottom of file)
-    "COORDINATES": [
+    "COORDINATES": (
         "Node",
         "X",
         "Y"
-    ],
+    ),
 
-    "VERTICES": [
+    "VERTICES": (
         "Link",
         "Data"
-    ],
+    ),
 
-    "POLYGONS": [
+    "POLYGONS": (
         "Subcatch",
         "Data"
-    ],
+    ),
 
-    "LABELS": [
+    "LABELS": (
         "X",
         "Y",
         "Label",
         "Anchor"
-    ],
+    ),
 }
 
+# Read-only view: parsed results share these tuples, so they must never change
+SECTION_HEADERS = MappingProxyType(SECTION_HEADERS)
+
+# Column name -> position in a parsed row's value list (the leading ID column
+# is the dict key, so value positions are header positions minus one)
+HEADER_INDEX = MappingProxyType({
+    sec: {name: i for i, name in enumerate(cols[1:])}
+    for sec, cols in SECTION_HEADERS.items()
+})
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # SECTION 3: INP TEXT PARSING
 #   Reads INP file lines and produces a structured INPParseResult containing
 #   sections (element ID → values), headers, tags, and descriptions.
 # ═══════════════════════════════════════════════════════════════════════════════
-@dataclass
+@dataclass(slots=True)
 class INPParseResult:
     """Structured result of parsing a SWMM INP file."""
     sections: Dict[str, Dict[str, List[str]]] = field(default_factory=lambda: defaultdict(dict))
     headers: Dict[str, List[str]] = field(default_factory=dict)
     tags: Dict[str, str] = field(default_factory=dict)
     descriptions: Dict[str, str] = field(default_factory=dict)
+    options_flat: Dict[str, str] = field(default_factory=dict)  # OPTIONS keyword -> value
 
 def _parse_inp_iter(lines) -> INPParseResult:
     """Parse INP file lines into a structured INPParseResult."""
@@ -520,13 +545,14 @@ def _parse_inp_iter(lines) -> INPParseResult:
 
     for raw in lines:
         line = raw.rstrip("\n")
+        stripped = line.strip()
 
-        # 1. Section header detection: [SECTION_NAME]
-        m = re.match(r"^\s*\[([^\]]+)\]\s*$", line)
-        if m:
-            current = m.group(1).upper()
+        # 1. Section header detection: [SECTION_NAME] (non-empty, no inner "]")
+        if (stripped.startswith("[") and stripped.endswith("]")
+                and len(stripped) > 2 and "]" not in stripped[1:-1]):
+            current = sys.intern(stripped[1:-1].upper())
             current_control_rule = None
-            headers.setdefault(current, SECTION_HEADERS.get(current, []).copy())
+            headers.setdefault(current, SECTION_HEADERS.get(current, ()))
             descriptions.setdefault(current, "")
             after_header = True
             continue
@@ -536,8 +562,8 @@ def _parse_inp_iter(lines) -> INPParseResult:
 
         # [CONTROLS]: accumulate rule blocks by name
         if current == "CONTROLS":
-            if line.lstrip().upper().startswith("RULE "):
-                parts = line.strip().split(maxsplit=1)
+            if line.lstrip()[:5].upper() == "RULE ":
+                parts = stripped.split(maxsplit=1)
                 if len(parts) >= 2:
                     current_control_rule = parts[1]
                     sections[current][current_control_rule] = [line]
@@ -627,32 +653,34 @@ def _parse_inp_iter(lines) -> INPParseResult:
              
              continue
 
+        if not stripped:
+            continue
+
+        # Classify the line once: `;;` column header, `;` comment, or data
+        prefix2 = stripped[:2]
+        is_comment = prefix2[:1] == ";" and prefix2 != ";;"
+
         # 2. Capture description comment (single `;` line immediately after header)
         if after_header:
-            if line.lstrip().startswith(";") and not line.lstrip().startswith(";;"):
-                descriptions[current] = line.lstrip("; ").strip()
-                after_header = False
+            after_header = False
+            if is_comment:
+                descriptions[current] = stripped.lstrip("; ").strip()
                 continue
-            elif line.strip() != "":
-                after_header = False
-
-        if not line.strip():
-            continue
 
         # 3. Skip ordinary comments (single `;`; double `;;` are column headers)
-        if line.lstrip().startswith(";") and not line.lstrip().startswith(";;"):
+        if is_comment:
             continue
 
         # 4. Parse column headers (`;;`-prefixed lines)
-        if line.strip().startswith(";;"):
-            content = line.strip()[2:].strip()
+        if prefix2 == ";;":
+            content = stripped[2:].strip()
             if content and not all(c in "- " for c in content):
                 if not headers[current]:
-                    headers[current] = re.split(r"\s{2,}", content)
+                    headers[current] = _RE_DOUBLE_WS.split(content)
             continue
 
         # 5. Parse data lines
-        tokens = re.split(r"\s+", line.strip())
+        tokens = line.split()
         if not tokens:
             continue
 
@@ -661,7 +689,7 @@ def _parse_inp_iter(lines) -> INPParseResult:
         # [TAGS]
         if current == "TAGS":
             if len(tokens) >= 3:
-                element_id = tokens[1]
+                element_id = sys.intern(tokens[1])
                 tag_name = " ".join(tokens[2:])
                 tags[element_id] = tag_name
             continue
@@ -759,7 +787,7 @@ def _parse_inp_iter(lines) -> INPParseResult:
         # [TREATMENT]: expression may contain spaces
         if current == 'TREATMENT':
             if len(tokens) >= 3:
-                node_id = tokens[0]
+                node_id = sys.intern(tokens[0])
                 pollutant = tokens[1]
                 expression = " ".join(tokens[2:])
                 sections[current][node_id] = [pollutant, expression]
@@ -787,8 +815,10 @@ def _parse_inp_iter(lines) -> INPParseResult:
             sections[current][key].append(line.strip())
             continue
 
-        # Generic parsing: first token = element ID, rest = values
-        element_id = tokens[0]
+        # Generic parsing: first token = element ID, rest = values.
+        # IDs recur across sections (JUNCTIONS, CONDUITS, COORDINATES, ...); intern
+        # them so every dict keyed by the same ID shares one string object.
+        element_id = sys.intern(tokens[0])
         if current == "OPTIONS":
             values = [" ".join(tokens[1:])]
         else:
@@ -816,7 +846,7 @@ def _parse_inp_iter(lines) -> INPParseResult:
             if sec_name not in sections:
                 sections[sec_name] = {}
             for eid, points in temp_points[sec_name].items():
-                sections[sec_name][eid] = [json.dumps(points)]
+                sections[sec_name][sys.intern(eid)] = [json.dumps(points)]
 
     # Finalize HYDROGRAPHS: inject Rain Gage from mapping lines
     if "HYDROGRAPHS" in sections and temp_hydro_gages:
@@ -877,14 +907,11 @@ def _parse_inp_iter(lines) -> INPParseResult:
             layers_json = json.dumps(ldata["layers"])
             sections["LID_CONTROLS"][lid_id] = [ldata["type"], layers_json]
 
+    # Flatten OPTIONS once for cheap keyword lookups downstream
+    options_flat = {k: (v[0] if v else "") for k, v in sections.get("OPTIONS", {}).items()}
+
     # Post-process INFILTRATION based on OPTIONS
-    infil_method = "HORTON"
-    if "OPTIONS" in sections and "INFILTRATION" in sections["OPTIONS"]:
-          val_list = sections["OPTIONS"]["INFILTRATION"]
-          if val_list and val_list[0].upper().strip() == "GREEN_AMPT":
-             infil_method = "GREEN_AMPT"
-    
-    if infil_method == "GREEN_AMPT":
+    if options_flat.get("INFILTRATION", "").upper().strip() == "GREEN_AMPT":
         headers["INFILTRATION"] = ["Subcatch", "Suction Head (in)", "Conductivity (in/hr)", "Initial Deficit (frac.)"]
         
         if "INFILTRATION" in sections:
@@ -892,7 +919,7 @@ def _parse_inp_iter(lines) -> INPParseResult:
                 if len(vals) > 3:
                      sections["INFILTRATION"][sub_id] = vals[:3]
 
-    return INPParseResult(sections, headers, tags, descriptions)
+    return INPParseResult(sections, headers, tags, descriptions, options_flat)
 
 
 
@@ -902,13 +929,16 @@ def _parse_inp_iter(lines) -> INPParseResult:
 #   lines. Also provides distance, centroid, and bounding-box helper functions
 #   used by the rename detection logic.
 # ═══════════════════════════════════════════════════════════════════════════════
-@dataclass
+@dataclass(slots=True)
 class SWMMGeometry:
     """Parsed spatial data from an INP file."""
     nodes: Dict[str, Tuple[float, float]]
     links: Dict[str, List[Tuple[float, float]]]
     subpolys: Dict[str, List[List[Tuple[float, float]]]]
 
+_GEOM_LINK_SECTIONS = frozenset(("[CONDUITS]", "[PUMPS]", "[ORIFICES]", "[WEIRS]", "[OUTLETS]"))
+_GEOM_SECTIONS = _GEOM_LINK_SECTIONS | {"[COORDINATES]", "[VERTICES]", "[POLYGONS]"}
+
 def _parse_geom_iter(lines) -> SWMMGeometry:
     """Extract node coordinates, link paths, and subcatchment polygons from INP lines."""
     nodes_raw: Dict[str, Tuple[float, float]] = {}
@@ -926,18 +956,22 @@ def _parse_geom_iter(lines) -> SWMMGeometry:
             section = line.upper()
             continue
 
-        parts = re.split(r"\s+", line)
+        # Only a handful of sections carry geometry; don't tokenize the rest
+        if section not in _GEOM_SECTIONS:
+            continue
+
+        parts = line.split()
 
         if section == "[COORDINATES]" and len(parts) >= 3:
-            node, x, y = parts[0], float(parts[1]), float(parts[2])
+            node, x, y = sys.intern(parts[0]), float(parts[1]), float(parts[2])
             nodes_raw[node] = (x, y)
 
         elif section == "[VERTICES]" and len(parts) >= 3:
             link, x, y = parts[0], float(parts[1]), float(parts[2])
             vertices_raw[link].append((x, y))
 
-        elif section in ("[CONDUITS]", "[PUMPS]", "[ORIFICES]", "[WEIRS]", "[OUTLETS]") and len(parts) >= 3:
-            link, n1, n2 = parts[0], parts[1], parts[2]
+        elif section in _GEOM_LINK_SECTIONS and len(parts) >= 3:
+            link, n1, n2 = sys.intern(parts[0]), sys.intern(parts[1]), sys.intern(parts[2])
             links_endpoints[link] = (n1, n2)
 
         elif section == "[POLYGONS]" and len(parts) >= 3:
@@ -945,7 +979,8 @@ def _parse_geom_iter(lines) -> SWMMGeometry:
             x, y = float(parts[1]), float(parts[2])
             
             if sub not in subpolys_raw:
-                subpolys_raw[sub] = [[]]
+                # Key by the interned name so it shares storage with SUBCATCHMENTS
+                subpolys_raw[sys.intern(sub)] = [[]]
 
             current_ring = subpolys_raw[sub][-1]
             
@@ -982,47 +1017,50 @@ def _dist_m_xy(p1: Tuple[float, float], p2: Tuple[float, float]) -> float:
     dy = (p2[1] - p1[1]) * _FEET_TO_M
     return math.hypot(dx, dy)
 
+def _d2_ft(p1: Tuple[float, float], p2: Tuple[float, float]) -> float:
+    """Squared planar distance in ft²; for threshold/ranking comparisons only."""
+    dx = p2[0] - p1[0]
+    dy = p2[1] - p1[1]
+    return dx * dx + dy * dy
+
 def _polyline_length_m(coords: List[Tuple[float, float]]) -> float:
     if not coords or len(coords) < 2:
         return 0.0
-    return sum(_dist_m_xy(a, b) for a, b in zip(coords[:-1], coords[1:]))
+    # Sum segment lengths in feet via math.dist (C loop), convert once
+    return sum(map(math.dist, coords, coords[1:])) * _FEET_TO_M
 
-def _centroid_xy(coords: Any) -> Optional[Tuple[float, float]]:
-    """Compute the arithmetic mean centroid of a coordinate set (single or multi-ring)."""
+def _xy_columns(coords: Any) -> Optional[Tuple[Tuple[float, ...], Tuple[float, ...]]]:
+    """Transpose a coordinate set (single or multi-ring) into (xs, ys) columns."""
     if not coords:
         return None
-    
+
     # Flatten multi-ring coordinates
-    points = []
     if isinstance(coords[0], list):
-        for ring in coords:
-            points.extend(ring)
+        points = [p for ring in coords for p in ring]
     else:
         points = coords
-        
+
     if not points:
         return None
-        
-    x = sum(p[0] for p in points) / len(points)
-    y = sum(p[1] for p in points) / len(points)
-    return (x, y)
+
+    xs, ys = zip(*points)
+    return xs, ys
+
+def _centroid_xy(coords: Any) -> Optional[Tuple[float, float]]:
+    """Compute the arithmetic mean centroid of a coordinate set (single or multi-ring)."""
+    cols = _xy_columns(coords)
+    if cols is None:
+        return None
+    xs, ys = cols
+    n = len(xs)
+    return (sum(xs) / n, sum(ys) / n)
 
 def _bbox_area_m2(coords: Any) -> float:
     """Compute bounding-box area in square meters from coordinate set."""
-    if not coords:
+    cols = _xy_columns(coords)
+    if cols is None:
         return 0.0
-        
-    points = []
-    if isinstance(coords[0], list):
-        for ring in coords:
-            points.extend(ring)
-    else:
-        points = coords
-        
-    if not points: 
-        return 0.0
-
-    xs = [p[0] for p in points]; ys = [p[1] for p in points]
+    xs, ys = cols
     w_ft = max(xs) - min(xs)
     h_ft = max(ys) - min(ys)
     return (w_ft * _FEET_TO_M) * (h_ft * _FEET_TO_M)
@@ -1062,13 +1100,27 @@ class SpatialIndex:
             for dy in (-1, 0, 1):
                 candidates.extend(self.grid.get((cx + dx, cy + dy), []))
         return candidates
+def _assign_pairs(pairs: List[Tuple[float, str, str]]) -> Dict[str, str]:
+    """One-to-one matching from (score, old_id, new_id) candidates, best score first."""
+    pairs.sort()
+    renames: Dict[str, str] = {}
+    used_new = set()
+    for _, old_id, new_id in pairs:
+        if old_id in renames or new_id in used_new:
+            continue
+        renames[old_id] = new_id
+        used_new.add(new_id)
+    return renames
+
 def _build_node_renames(pr1: INPParseResult, pr2: INPParseResult,
                         g1: SWMMGeometry, g2: SWMMGeometry,
                         eps_m: float = 0.5 * _FEET_TO_M) -> Dict[str, str]:
     """Identify renamed nodes by matching coordinates within tolerance."""
     node_secs = ("JUNCTIONS", "OUTFALLS", "DIVIDERS", "STORAGE")
-    ids1 = set().union(*[set(pr1.sections.get(s, {})) for s in node_secs])
-    ids2 = set().union(*[set(pr2.sections.get(s, {})) for s in node_secs])
+    ids1, ids2 = set(), set()
+    for s in node_secs:
+        ids1.update(pr1.sections.get(s, ()))
+        ids2.update(pr2.sections.get(s, ()))
 
     u1 = [nid for nid in ids1 if nid not in ids2]
     u2 = [nid for nid in ids2 if nid not in ids1]
@@ -1076,8 +1128,11 @@ def _build_node_renames(pr1: INPParseResult, pr2: INPParseResult,
     n1 = g1.nodes if g1 else {}
     n2 = g2.nodes if g2 else {}
 
-    # Index file-2 unique nodes for spatial lookup
-    idx = SpatialIndex(cell_size_ft=500.0)
+    # Index file-2 unique nodes for spatial lookup. Cells are sized to the match
+    # tolerance so the 3x3 neighborhood query is an eps-bounded radius search.
+    tol_ft = eps_m / _FEET_TO_M
+    eps_ft2 = tol_ft * tol_ft
+    idx = SpatialIndex(cell_size_ft=max(tol_ft, 1e-6))
     for new_id in u2:
         if new_id in n2:
             x, y = n2[new_id]
@@ -1090,36 +1145,21 @@ def _build_node_renames(pr1: INPParseResult, pr2: INPParseResult,
         p1 = n1[old_id]
         x1, y1 = p1
         
-        best = None
-        best_d = float("inf")
-        
         candidates = idx.query_candidates(x1, y1)
 
+        # Keep every in-tolerance candidate so a node that loses its nearest
+        # match to a closer node can still fall back to its next-best one
         for new_id, x2, y2 in candidates:
             # Quick bounding-box pre-filter
-            tol_ft = eps_m / _FEET_TO_M
             if abs(x1 - x2) > tol_ft or abs(y1 - y2) > tol_ft:
                 continue
 
-            d = _dist_m_xy((x1, y1), (x2, y2))
-            
-            if d < eps_m and d < best_d:
-                best, best_d = new_id, d
-        
-        if best is not None:
-            pairs.append((old_id, best, best_d))
+            # Squared distance ranks the same as distance; no sqrt needed
+            d2 = _d2_ft(p1, (x2, y2))
+            if d2 < eps_ft2:
+                pairs.append((d2, old_id, new_id))
 
-    pairs.sort(key=lambda x: x[2])
-    renames: Dict[str, str] = {}
-    used_new = set()
-    
-    for old_id, new_id, _ in pairs:
-        if new_id in used_new:
-            continue
-        renames[old_id] = new_id
-        used_new.add(new_id)
-        
-    return renames
+    return _assign_pairs(pairs)
 
 def _build_link_renames(pr1: INPParseResult, pr2: INPParseResult,
                         g1: SWMMGeometry, g2: SWMMGeometry,
@@ -1128,23 +1168,31 @@ def _build_link_renames(pr1: INPParseResult, pr2: INPParseResult,
                         len_tol: float = 0.05) -> Dict[str, str]:
     """Identify renamed links by matching connectivity, length, and centroid proximity."""
     link_secs = ("CONDUITS", "PUMPS", "ORIFICES", "WEIRS", "OUTLETS")
-    ids1 = set().union(*[set(pr1.sections.get(s, {})) for s in link_secs])
-    ids2 = set().union(*[set(pr2.sections.get(s, {})) for s in link_secs])
+    ids1, ids2 = set(), set()
+    for s in link_secs:
+        ids1.update(pr1.sections.get(s, ()))
+        ids2.update(pr2.sections.get(s, ()))
 
     u1 = [lid for lid in ids1 if lid not in ids2]
     u2 = [lid for lid in ids2 if lid not in ids1]
 
-    # Helper to look up start/end node IDs for a link
-    def endpoints(pr: INPParseResult, lid: str) -> tuple:
+    # Link ID -> (start node, end node), built once per file; first section wins
+    def endpoint_map(pr: INPParseResult) -> Dict[str, Tuple[str, str]]:
+        eps = {}
         for s in link_secs:
-            if lid in pr.sections.get(s, {}):
-                vals = pr.sections[s][lid]
-                if len(vals) >= 2:
-                    return (vals[0], vals[1])
-        return (None, None)
+            for lid, vals in pr.sections.get(s, {}).items():
+                if len(vals) >= 2 and lid not in eps:
+                    eps[lid] = (vals[0], vals[1])
+        return eps
 
+    ep1 = endpoint_map(pr1)
+    ep2 = endpoint_map(pr2)
+    no_endpoints = (None, None)
+
+    # Centroid/length caches for file-2 candidates, computed once up front
     idx = SpatialIndex(cell_size_ft=500.0)
-    link2_meta = {}  # Cached metadata for file-2 links
+    cent2: Dict[str, Tuple[float, float]] = {}
+    len2_by_id: Dict[str, float] = {}
     
     for new_id in u2:
         coords2 = g2.links.get(new_id) if g2 else None
@@ -1153,62 +1201,43 @@ def _build_link_renames(pr1: INPParseResult, pr2: INPParseResult,
         c2 = _centroid_xy(coords2)
         if c2:
             idx.add(new_id, c2[0], c2[1])
-            link2_meta[new_id] = {
-                "coords": coords2,
-                "len": _polyline_length_m(coords2),
-                "endpoints": endpoints(pr2, new_id),
-                "centroid": c2
-            }
+            cent2[new_id] = c2
+            len2_by_id[new_id] = _polyline_length_m(coords2)
 
-    renames: Dict[str, str] = {}
-    used_new = set()
-    inv_node_renames = {v: k for k, v in node_renames.items()}
+    eps_centroid_ft2 = (eps_centroid_m / _FEET_TO_M) ** 2
+    pairs = []
 
     for old_id in u1:
         coords1 = g1.links.get(old_id) if g1 else None
         if not coords1 or len(coords1) < 2:
             continue
-        e1 = endpoints(pr1, old_id)
+        # Translate file-1 endpoints into file-2 names once per old link
+        e1 = ep1.get(old_id, no_endpoints)
+        e1_mapped = {node_renames.get(x, x) for x in e1}
         len1 = _polyline_length_m(coords1)
         c1 = _centroid_xy(coords1)
         if not c1: continue
 
-        best = None
-        best_score = float("inf")
-        
         candidates = idx.query_candidates(c1[0], c1[1])
 
         for new_id, _, _ in candidates:
-            if new_id in used_new: 
-                continue
-                
-            meta2 = link2_meta.get(new_id)
-            if not meta2: continue
-            
-            e2 = meta2["endpoints"]
-            e2_mapped = tuple(inv_node_renames.get(x, x) for x in e2)
-            endpoint_ok = set(e1) == set(e2_mapped)
+            endpoint_ok = e1_mapped == set(ep2.get(new_id, no_endpoints))
 
-            len2 = meta2["len"]
+            len2 = len2_by_id[new_id]
             if not _ratio_close(max(len1, 1e-6), max(len2, 1e-6), tol=len_tol):
                 if not endpoint_ok:
                     continue
 
-            c2 = meta2["centroid"]
-            dcent = _dist_m_xy(c1, c2)
-            
-            if dcent > eps_centroid_m and not endpoint_ok:
+            d2 = _d2_ft(c1, cent2[new_id])
+            if d2 > eps_centroid_ft2 and not endpoint_ok:
                 continue
 
+            # Score mixes a fixed endpoint penalty with metres, so take the sqrt here
+            dcent = math.sqrt(d2) * _FEET_TO_M
             score = (0 if endpoint_ok else 1) * 1000 + dcent
-            if score < best_score:
-                best, best_score = new_id, score
+            pairs.append((score, old_id, new_id))
 
-        if best is not None:
-            renames[old_id] = best
-            used_new.add(best)
-
-    return renames
+    return _assign_pairs(pairs)
 
 def _build_sub_renames(pr1: INPParseResult, pr2: INPParseResult,
                        g1: SWMMGeometry, g2: SWMMGeometry,
@@ -1226,7 +1255,8 @@ def _build_sub_renames(pr1: INPParseResult, pr2: INPParseResult,
 
     for new_id in u2:
         poly2 = g2.subpolys.get(new_id) if g2 else None
-        if not poly2 or len(poly2) < 3:
+        # subpolys values are lists of rings; require 3+ vertices, not 3+ rings
+        if not poly2 or sum(map(len, poly2)) < 3:
             continue
         c2 = _centroid_xy(poly2)
         if c2:
@@ -1237,23 +1267,18 @@ def _build_sub_renames(pr1: INPParseResult, pr2: INPParseResult,
                 "poly": poly2
             }
 
-    renames: Dict[str, str] = {}
-    used_new = set()
+    eps_centroid_ft2 = (eps_centroid_m / _FEET_TO_M) ** 2
+    pairs = []
     for old_id in u1:
         poly1 = g1.subpolys.get(old_id) if g1 else None
-        if not poly1 or len(poly1) < 3:
+        if not poly1 or sum(map(len, poly1)) < 3:
             continue
         c1 = _centroid_xy(poly1)
         a1 = _bbox_area_m2(poly1) or 1.0
 
-        best = None
-        best_score = float("inf")
-        
         candidates = idx.query_candidates(c1[0], c1[1])
         
         for new_id, _, _ in candidates:
-            if new_id in used_new: continue
-            
             meta2 = sub2_meta.get(new_id)
             if not meta2: continue
             
@@ -1261,78 +1286,87 @@ def _build_sub_renames(pr1: INPParseResult, pr2: INPParseResult,
             if not _ratio_close(a1, a2, tol=area_tol):
                 continue
                 
-            c2 = meta2["centroid"]
-            dcent = _dist_m_xy(c1, c2)
-            if dcent > eps_centroid_m:
+            d2 = _d2_ft(c1, meta2["centroid"])
+            if d2 > eps_centroid_ft2:
                 continue
             
-            if dcent < best_score:
-                best, best_score = new_id, dcent
+            pairs.append((d2, old_id, new_id))
 
-        if best is not None:
-            renames[old_id] = best
-            used_new.add(new_id)
-
-    return renames
+    return _assign_pairs(pairs)
 
 def _apply_renames_to_pr2(pr2: INPParseResult,
                           node_ren: Dict[str, str],
                           link_ren: Dict[str, str],
                           sub_ren: Dict[str, str]) -> None:
+    # pr2's section dicts and rows may be shared with the parse cache: every
+    # edit goes into a copy that is rebound on pr2
     node_new_to_old = {v: k for k, v in node_ren.items()}
     link_new_to_old = {v: k for k, v in link_ren.items()}
     sub_new_to_old  = {v: k for k, v in sub_ren.items()}
 
-    for sec in ("JUNCTIONS", "OUTFALLS", "DIVIDERS", "STORAGE"):
-        secmap = pr2.sections.get(sec, {})
-        for new_id, old_id in list(node_new_to_old.items()):
+    def rekey(secmap: Dict[str, List[str]], new_to_old: Dict[str, str]) -> None:
+        for new_id, old_id in new_to_old.items():
             if new_id in secmap and old_id not in secmap:
                 secmap[old_id] = secmap.pop(new_id)
 
-    for sec in ("CONDUITS", "PUMPS", "ORIFICES", "WEIRS", "OUTLETS"):
-        secmap = pr2.sections.get(sec, {})
-        for lid, vals in list(secmap.items()):
-            if len(vals) >= 2:
-                vals[0] = node_new_to_old.get(vals[0], vals[0])
-                vals[1] = node_new_to_old.get(vals[1], vals[1])
-        for new_id, old_id in list(link_new_to_old.items()):
-            if new_id in secmap and old_id not in secmap:
-                secmap[old_id] = secmap.pop(new_id)
-
-    secmap = pr2.sections.get("SUBCATCHMENTS", {})
-    for new_id, old_id in list(sub_new_to_old.items()):
-        if new_id in secmap and old_id not in secmap:
-            secmap[old_id] = secmap.pop(new_id)
+    if node_new_to_old:
+        for sec in ("JUNCTIONS", "OUTFALLS", "DIVIDERS", "STORAGE"):
+            if sec in pr2.sections:
+                secmap = pr2.sections[sec] = dict(pr2.sections[sec])
+                rekey(secmap, node_new_to_old)
 
-    for new_id, old_id in list(node_new_to_old.items()) + list(link_new_to_old.items()) + list(sub_new_to_old.items()):
-        if new_id in pr2.tags and old_id not in pr2.tags:
-            pr2.tags[old_id] = pr2.tags.pop(new_id)
+    if node_new_to_old or link_new_to_old:
+        for sec in ("CONDUITS", "PUMPS", "ORIFICES", "WEIRS", "OUTLETS"):
+            if sec not in pr2.sections:
+                continue
+            secmap = pr2.sections[sec] = dict(pr2.sections[sec])
+            for lid, vals in secmap.items():
+                if len(vals) >= 2 and (vals[0] in node_new_to_old or vals[1] in node_new_to_old):
+                    secmap[lid] = [node_new_to_old.get(vals[0], vals[0]),
+                                   node_new_to_old.get(vals[1], vals[1]), *vals[2:]]
+            rekey(secmap, link_new_to_old)
+
+    if sub_new_to_old and "SUBCATCHMENTS" in pr2.sections:
+        secmap = pr2.sections["SUBCATCHMENTS"] = dict(pr2.sections["SUBCATCHMENTS"])
+        rekey(secmap, sub_new_to_old)
+
+    if node_new_to_old or link_new_to_old or sub_new_to_old:
+        pr2.tags = dict(pr2.tags)
+        rekey(pr2.tags, node_new_to_old)
+        rekey(pr2.tags, link_new_to_old)
+        rekey(pr2.tags, sub_new_to_old)
 
 def _apply_renames_to_geometry(g2: SWMMGeometry,
                                node_ren: Dict[str, str],
                                link_ren: Dict[str, str],
                                sub_ren: Dict[str, str]) -> None:
     """Remap geometry keys from new IDs back to old IDs for renamed elements."""
-    node_new_to_old = {v: k for k, v in node_ren.items()}
-    for new_id, old_id in list(node_new_to_old.items()):
-        if new_id in g2.nodes and old_id not in g2.nodes:
-            g2.nodes[old_id] = g2.nodes.pop(new_id)
-
-    link_new_to_old = {v: k for k, v in link_ren.items()}
-    for new_id, old_id in list(link_new_to_old.items()):
-        if new_id in g2.links and old_id not in g2.links:
-            g2.links[old_id] = g2.links.pop(new_id)
-
-    sub_new_to_old = {v: k for k, v in sub_ren.items()}
-    for new_id, old_id in list(sub_new_to_old.items()):
-        if new_id in g2.subpolys and old_id not in g2.subpolys:
-            g2.subpolys[old_id] = g2.subpolys.pop(new_id)
-
-def spatial_reconcile_and_remap_using_geom(pr1: INPParseResult, pr2: INPParseResult,
-                                           g1: SWMMGeometry, g2: SWMMGeometry) -> Dict[str, Dict[str, str]]:
+    # Geometry dicts may be shared with the parse cache; remap into copies
+    def remapped(coords: Dict[str, Any], ren: Dict[str, str]) -> Dict[str, Any]:
+        if not ren:
+            return coords
+        coords = dict(coords)
+        for old_id, new_id in ren.items():
+            if new_id in coords and old_id not in coords:
+                coords[old_id] = coords.pop(new_id)
+        return coords
+
+    g2.nodes = remapped(g2.nodes, node_ren)
+    g2.links = remapped(g2.links, link_ren)
+    g2.subpolys = remapped(g2.subpolys, sub_ren)
+
+def _match_renames(pr1: INPParseResult, pr2: INPParseResult,
+                   g1: SWMMGeometry, g2: SWMMGeometry) -> Tuple[Dict[str, str], Dict[str, str], Dict[str, str]]:
+    """Run the node, link and subcatchment rename matchers (old ID -> new ID)."""
     node_ren = _build_node_renames(pr1, pr2, g1, g2)
     link_ren = _build_link_renames(pr1, pr2, g1, g2, node_ren)
     sub_ren  = _build_sub_renames(pr1, pr2, g1, g2)
+    return node_ren, link_ren, sub_ren
+
+def spatial_reconcile_and_remap_using_geom(pr1: INPParseResult, pr2: INPParseResult,
+                                           g1: SWMMGeometry, g2: SWMMGeometry,
+                                           matches=None) -> Dict[str, Dict[str, str]]:
+    node_ren, link_ren, sub_ren = matches or _match_renames(pr1, pr2, g1, g2)
 
     _apply_renames_to_pr2(pr2, node_ren, link_ren, sub_ren)
     _apply_renames_to_geometry(g2, node_ren, link_ren, sub_ren)
@@ -1360,7 +1394,7 @@ def spatial_reconcile_and_remap_using_geom(pr1: INPParseResult, pr2: INPParseRes
 #   and changed elements. Includes field-level numerical diffs and
 #   tolerance-based filtering.
 # ═══════════════════════════════════════════════════════════════════════════════
-@dataclass
+@dataclass(slots=True)
 class DiffSection:
     """Added, removed, and changed elements for a single INP section."""
     added: List[str] = field(default_factory=list)
@@ -1397,28 +1431,38 @@ def compare_sections(secs1: Dict[str, Dict[str, List[str]]],
     
     all_sections = sorted(set(secs1) | set(secs2))
     total_secs = len(all_sections)
+    secs1_get, secs2_get = secs1.get, secs2.get
 
     for i, sec in enumerate(all_sections):
         if progress_callback:
             pct = 40 + (i / max(total_secs, 1) * 50)
             progress_callback(pct, f"Comparing {sec}...")
 
-        recs1 = secs1.get(sec, {})
-        recs2 = secs2.get(sec, {})
-        keys1, keys2 = set(recs1), set(recs2)
+        recs1 = secs1_get(sec, _EMPTY_MAP)
+        recs2 = secs2_get(sec, _EMPTY_MAP)
+        keys1, keys2 = recs1.keys(), recs2.keys()
         
         added = sorted(keys2 - keys1)
         removed = sorted(keys1 - keys2)
-        changed = {k: (recs1[k], recs2[k]) for k in (keys1 & keys2) if recs1.get(k) != recs2.get(k)}
+        changed = {}
+        for k in keys1 & keys2:
+            v1 = recs1[k]
+            v2 = recs2[k]
+            if v1 is not v2 and v1 != v2:
+                changed[k] = (v1, v2)
 
 
 
         if added or removed or changed:
             out[sec] = DiffSection(added, removed, changed)
-            all_headers[sec] = headers1.get(sec) or headers2.get(sec, [])
+            all_headers[sec] = headers1.get(sec) or headers2.get(sec, _EMPTY)
             
     return out, all_headers
 
+_CONDUIT_DIFF_FIELDS = tuple(
+    (name, HEADER_INDEX["CONDUITS"][name]) for name in ("Length", "Roughness", "InOffset", "OutOffset")
+)
+
 def _calculate_field_diffs(old_vals: List[str], new_vals: List[str], headers: List[str], section: str,
                            secs1: Dict[str, Dict[str, List[str]]] = None,
                            secs2: Dict[str, Dict[str, List[str]]] = None) -> Dict[str, float]:
@@ -1436,8 +1480,7 @@ def _calculate_field_diffs(old_vals: List[str], new_vals: List[str], headers: Li
         return None
 
     if section == "CONDUITS":
-        fields_to_diff = {"Length": 2, "Roughness": 3, "InOffset": 4, "OutOffset": 5}
-        for field, idx in fields_to_diff.items():
+        for field, idx in _CONDUIT_DIFF_FIELDS:
             old_v, new_v = get_val(old_vals, idx), get_val(new_vals, idx)
             if old_v is not None and new_v is not None:
                 diffs[field] = new_v - old_v
@@ -1496,9 +1539,10 @@ def _filter_changes_by_tolerance(diffs: Dict[str, DiffSection], tolerances: Dict
     
     for sec, diff_section in diffs.items():
         ids_to_remove = []
+        sec_renames = (renames or {}).get(sec) or {}
         for item_id, (old_vals, new_vals) in diff_section.changed.items():
             # Skip renamed items — renames are always flagged as changes
-            if renames and sec in renames and item_id in renames[sec]:
+            if item_id in sec_renames:
                 continue
 
             max_len = max(len(old_vals), len(new_vals))
@@ -1574,47 +1618,263 @@ def _filter_changes_by_tolerance(diffs: Dict[str, DiffSection], tolerances: Dict
 #   reconciliation, diffing, tolerance filtering, and JSON output assembly.
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def _to_text_io(payload) -> io.StringIO:
-    """Convert bytes/str/buffer input to a StringIO for line-by-line parsing."""
+def _as_buffer(payload):
+    """Validate input as str or a bytes-like buffer, without copying it."""
+    if isinstance(payload, (str, bytes)):
+        return payload
+    try:
+        return memoryview(payload)  # bytearray/memoryview/JS buffers, zero-copy
+    except TypeError as e:
+        raise TypeError(f"Unsupported input type for INP bytes: {type(payload)!r}") from e
+
+def _to_text(payload) -> str:
+    """Decode str/bytes/buffer input to text; buffers decode in place."""
+    payload = _as_buffer(payload)
     if isinstance(payload, str):
-        return io.StringIO(payload)
-    if isinstance(payload, (bytes, bytearray)):
-        data = payload
-    elif isinstance(payload, memoryview):
-        data = payload.tobytes()
+        return payload
+    return str(payload, "utf-8", "ignore")
+
+def _to_lines(payload) -> List[str]:
+    """Decoded input split into lines, shared by both parsers."""
+    return _to_text(payload).splitlines()
+
+
+def _dumps_payload(obj) -> str:
+    """Serialize the run_compare result; orjson when available, compact json otherwise."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    # No whitespace and no cycle tracking: the payload is a freshly built tree
+    return json.dumps(obj, separators=(",", ":"), check_circular=False)
+
+# Top-level keys whose (large) dict values are emitted one entry per fragment
+_STREAMED_KEYS = frozenset(("diffs", "sections1", "sections2", "geometry"))
+
+def _iter_payload(out: Dict[str, Any]) -> Iterator[str]:
+    """Yield the JSON encoding of `out` in chunks, splitting the bulky top-level dicts."""
+    sep = "{"
+    for key, val in out.items():
+        yield sep + _dumps_payload(key) + ":"
+        sep = ","
+        if key in _STREAMED_KEYS and isinstance(val, Mapping):
+            inner = "{"
+            for k, v in val.items():
+                yield inner + _dumps_payload(k) + ":" + _dumps_payload(v)
+                inner = ","
+            yield "}" if inner == "," else "{}"
+        else:
+            yield _dumps_payload(val)
+    yield "}"
+
+
+# --- Parse cache: identical file contents skip re-parsing across calls ---
+
+# Entries are the parser's own results, shared read-only with every compare
+# that hits them (see _working_copy). Parsed objects take roughly 8x the size
+# of the source text, so the cache is capped by total input size; larger
+# models are simply re-parsed.
+_PARSE_CACHE: "OrderedDict[bytes, Tuple[int, INPParseResult, SWMMGeometry]]" = OrderedDict()
+_PARSE_CACHE_SIZE = 4
+_PARSE_CACHE_MAX_BYTES = 8 * 1024 * 1024  # combined size of cached inputs, bytes
+
+def _content_key(payload) -> bytes:
+    """Digest of the raw file contents, used as the parse-cache key."""
+    data = payload.encode("utf-8") if isinstance(payload, str) else _as_buffer(payload)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+def _working_copy(pr: INPParseResult, g: SWMMGeometry) -> Tuple[INPParseResult, SWMMGeometry]:
+    """Fresh top-level containers over shared parse data.
+
+    run_compare only rebinds sections/headers/fields on these; it never edits
+    the row lists or per-section dicts in place, so cached results stay intact.
+    """
+    pr_view = INPParseResult(
+        sections=defaultdict(dict, pr.sections),
+        headers=dict(pr.headers),
+        tags=pr.tags,
+        descriptions=pr.descriptions,
+        options_flat=pr.options_flat,
+    )
+    return pr_view, SWMMGeometry(nodes=g.nodes, links=g.links, subpolys=g.subpolys)
+
+# Rename matches per (file 1, file 2) content pair. Entries are small ID maps,
+# so repeated comparisons skip spatial matching without holding any output.
+_RENAME_CACHE: "OrderedDict[Tuple[bytes, bytes], tuple]" = OrderedDict()
+_RENAME_CACHE_SIZE = 8
+
+def _parse_cache_get(key: bytes) -> Optional[Tuple[INPParseResult, SWMMGeometry]]:
+    hit = _PARSE_CACHE.get(key)
+    if hit is None:
+        return None
+    _PARSE_CACHE.move_to_end(key)
+    return hit[1], hit[2]
+
+def _parse_cache_put(key: bytes, size: int, pr: INPParseResult, g: SWMMGeometry) -> None:
+    if size > _PARSE_CACHE_MAX_BYTES:
+        return
+    _PARSE_CACHE[key] = (size, pr, g)
+    _PARSE_CACHE.move_to_end(key)
+    while (len(_PARSE_CACHE) > _PARSE_CACHE_SIZE
+           or sum(entry[0] for entry in _PARSE_CACHE.values()) > _PARSE_CACHE_MAX_BYTES):
+        _PARSE_CACHE.popitem(last=False)
+
+
+def _section_diff_json(sec: str, d: DiffSection,
+                       secs1: Dict[str, Dict[str, List[str]]],
+                       secs2: Dict[str, Dict[str, List[str]]],
+                       headers: Dict[str, List[str]],
+                       renames: Dict[str, Dict[str, str]],
+                       include_full: bool) -> Dict[str, Any]:
+    """Build the added/removed/changed payload for one diffed section."""
+    sec_headers = headers.get(sec, _EMPTY)
+    has_new_name_col = "New Name" in sec_headers
+    sec_renames = renames.get(sec) or {}
+    
+    changed_json = {}
+    for rid, (old_vals_orig, new_vals_orig) in d.changed.items():
+        
+        # Compute diffs on original values (before column injection)
+        field_diffs = _calculate_field_diffs(old_vals_orig, new_vals_orig, sec_headers, sec, secs1, secs2)
+
+        # Inject "New Name" column
+        if has_new_name_col:
+            prefix = [sec_renames.get(rid, "NA")]
+            v1_disp = prefix + old_vals_orig
+            v2_disp = prefix + new_vals_orig
+        else:
+            v1_disp = old_vals_orig
+            v2_disp = new_vals_orig
+            
+        changed_json[rid] = {
+            "values": [v1_disp, v2_disp],
+            "diff_values": field_diffs
+        }
+
+    # Added/Removed rows get an "NA" placeholder under the "New Name" column
+    if not include_full:
+        # compare_sections already built these as fresh sorted ID lists
+        added_json = d.added
+        removed_json = d.removed
     else:
-        try:
-            data = bytes(payload)
-        except Exception as e:
-            raise TypeError(f"Unsupported input type for INP bytes: {type(payload)!r}") from e
-    return io.StringIO(data.decode("utf-8", "ignore"))
+        s1get = secs1.get(sec, _EMPTY_MAP).get
+        s2get = secs2.get(sec, _EMPTY_MAP).get
+        added_json, removed_json = {}, {}
+        if has_new_name_col:
+            for rid in d.added:
+                added_json[rid] = ["NA", *s2get(rid, _EMPTY)]
+            for rid in d.removed:
+                removed_json[rid] = ["NA", *s1get(rid, _EMPTY)]
+        else:
+            for rid in d.added:
+                added_json[rid] = s2get(rid, _EMPTY)
+            for rid in d.removed:
+                removed_json[rid] = s1get(rid, _EMPTY)
+
+    return {
+        "added":   added_json,
+        "removed": removed_json,
+        "changed": changed_json
+    }
 
+# Sections the client needs in full: map symbology looks up every node/link ID's
+# section, and the shapefile export can include unchanged elements
+_FULL_ROW_SECTIONS = frozenset((
+    "JUNCTIONS", "OUTFALLS", "DIVIDERS", "STORAGE",
+    "CONDUITS", "PUMPS", "ORIFICES", "WEIRS", "OUTLETS",
+    "SUBCATCHMENTS",
+))
+
+def _slim_sections(sections: Dict[str, Dict[str, List[str]]],
+                   diffs: Dict[str, DiffSection],
+                   side: int) -> Dict[str, Dict[str, List[str]]]:
+    """Trim one file's sections to the rows the client reads.
+
+    Element sections are kept whole; elsewhere only the rows that diff ID lists
+    point at survive (added rows for file 2, removed rows for file 1).
+    """
+    slim = {}
+    for sec, rows in sections.items():
+        if sec in _FULL_ROW_SECTIONS:
+            slim[sec] = rows
+            continue
+        d = diffs.get(sec)
+        ids = (d.added if side == 2 else d.removed) if d else _EMPTY
+        if ids:
+            slim[sec] = {rid: rows[rid] for rid in ids if rid in rows}
+    return slim
+
+class _LazyDiffJson(Mapping):
+    """Read-only {section: diff payload} view that builds each entry on access.
+
+    Paired with _iter_payload, each section is built, encoded and released in
+    turn, so only one section's display rows are alive at a time.
+    """
+    def __init__(self, diffs: Dict[str, DiffSection], secs1, secs2, headers, renames, include_full: bool):
+        self._diffs = diffs
+        self._args = (secs1, secs2, headers, renames, include_full)
+
+    def __getitem__(self, sec: str) -> Dict[str, Any]:
+        return _section_diff_json(sec, self._diffs[sec], *self._args)
+
+    def __iter__(self):
+        return iter(self._diffs)
+
+    def __len__(self) -> int:
+        return len(self._diffs)
+
+
+def run_compare(file1_bytes, file2_bytes, tolerances_py=None, progress_callback=None,
+                include_full: bool = False) -> str:
+    """Main entry point: parse two INP files, detect renames, diff, and return JSON results.
+
+    Added/removed rows are emitted as ID lists that reference ``sections1`` /
+    ``sections2`` (which the output already carries); pass ``include_full=True``
+    to embed the full value rows in ``diffs`` as well.
+    """
+    return "".join(run_compare_iter(file1_bytes, file2_bytes, tolerances_py,
+                                    progress_callback, include_full))
+
+def run_compare_iter(file1_bytes, file2_bytes, tolerances_py=None, progress_callback=None,
+                     include_full: bool = False) -> Iterator[str]:
+    """Same as run_compare, but yields the JSON document in per-section fragments."""
+    # Buffers from the worker arrive as memoryviews; hash and decode them in
+    # place rather than copying to bytes first
+    payloads = (_as_buffer(file1_bytes), _as_buffer(file2_bytes))
+    keys = (_content_key(payloads[0]), _content_key(payloads[1]))
 
-def run_compare(file1_bytes, file2_bytes, tolerances_py=None, progress_callback=None) -> str:
-    """Main entry point: parse two INP files, detect renames, diff, and return JSON results."""
-    f1 = _to_text_io(file1_bytes)
-    f2 = _to_text_io(file2_bytes)
+    # Handle tolerances (may arrive as JS Proxy or Python dict)
+    tolerances = {}
+    if tolerances_py is not None:
+        to_py = getattr(tolerances_py, "to_py", None)
+        tolerances = to_py() if to_py is not None else tolerances_py
+
+    yield from _run_compare_chunks(payloads, keys, tolerances, progress_callback, include_full)
 
+def _run_compare_chunks(payloads, keys, tolerances: Dict[str, Any], progress_callback,
+                        include_full: bool) -> Iterator[str]:
+    """Parse, reconcile and diff two validated inputs; yields the JSON fragments."""
     if progress_callback: progress_callback(5, "Parsing inputs...")
 
-    pr1 = _parse_inp_iter(f1)
-    if progress_callback: progress_callback(10, "Parsed File 1...")
-    pr2 = _parse_inp_iter(f2)
-    if progress_callback: progress_callback(15, "Parsed File 2...")
+    # Reuse earlier parses of identical contents (e.g. the same baseline file)
+    parsed = [_parse_cache_get(k) for k in keys]
+    todo = [i for i, hit in enumerate(parsed) if hit is None]
+
+    # Split each file into lines once (C-level) and feed the same list to both parsers
+    lines = {i: _to_lines(payloads[i]) for i in todo}
+
+    for i in todo:
+        parsed[i] = (_parse_inp_iter(lines[i]), _parse_geom_iter(lines[i]))
+        if progress_callback: progress_callback(10 + 5 * i, f"Parsed File {i + 1}...")
 
-    f1.seek(0); f2.seek(0)
-    g1 = _parse_geom_iter(f1)
-    g2 = _parse_geom_iter(f2)
+    for i in todo:
+        _parse_cache_put(keys[i], len(payloads[i]), *parsed[i])
+    (pr1, g1), (pr2, g2) = (_working_copy(*p) for p in parsed)
     if progress_callback: progress_callback(20, "Parsed Geometry...")
 
     # Check for infiltration method mismatch
     warnings = {}
 
     def get_infil_method(pr):
-        if "OPTIONS" in pr.sections and "INFILTRATION" in pr.sections["OPTIONS"]:
-            val = pr.sections["OPTIONS"]["INFILTRATION"]
-            return val[0].upper().strip() if val else "HORTON"
-        return "HORTON"
+        return pr.options_flat.get("INFILTRATION", "HORTON").upper().strip()
 
     m1 = get_infil_method(pr1)
     m2 = get_infil_method(pr2)
@@ -1627,17 +1887,17 @@ def run_compare(file1_bytes, file2_bytes, tolerances_py=None, progress_callback=
         pr1.headers["INFILTRATION"] = []
         pr2.headers["INFILTRATION"] = []
 
-    # Handle tolerances (may arrive as JS Proxy or Python dict)
-    tolerances = {}
-    if tolerances_py is not None:
-        if hasattr(tolerances_py, 'to_py'):
-            tolerances = tolerances_py.to_py()
-        else:
-            tolerances = tolerances_py
-
     # Spatial reconciliation: detect renamed elements via geometry matching
     if progress_callback: progress_callback(25, " Reconciling spatial data...")
-    renames = spatial_reconcile_and_remap_using_geom(pr1, pr2, g1, g2)
+    # Matching depends only on the two inputs; reuse it for a repeated pair
+    matches = _RENAME_CACHE.get(keys)
+    if matches is None:
+        matches = _RENAME_CACHE[keys] = _match_renames(pr1, pr2, g1, g2)
+        while len(_RENAME_CACHE) > _RENAME_CACHE_SIZE:
+            _RENAME_CACHE.popitem(last=False)
+    else:
+        _RENAME_CACHE.move_to_end(keys)
+    renames = spatial_reconcile_and_remap_using_geom(pr1, pr2, g1, g2, matches)
     if progress_callback: progress_callback(35, " Spatial reconciliation done...")
 
     # Compare sections
@@ -1652,16 +1912,20 @@ def run_compare(file1_bytes, file2_bytes, tolerances_py=None, progress_callback=
 
     # Force renamed items into "changed" even if attributes are identical
 
+    secs1_get, secs2_get = pr1.sections.get, pr2.sections.get
     for sec, mapping in renames.items():
         if sec not in diffs:
             diffs[sec] = DiffSection()
-            headers[sec] = pr1.headers.get(sec) or pr2.headers.get(sec, [])
+            headers[sec] = pr1.headers.get(sec) or pr2.headers.get(sec, _EMPTY)
         
+        s1 = secs1_get(sec, _EMPTY_MAP)
+        s2 = secs2_get(sec, _EMPTY_MAP)
+        changed = diffs[sec].changed
         for old_id in mapping:
-            if old_id not in diffs[sec].changed:
-                v1 = pr1.sections.get(sec, {}).get(old_id, [])
-                v2 = pr2.sections.get(sec, {}).get(old_id, [])
-                diffs[sec].changed[old_id] = (v1, v2)
+            if old_id not in changed:
+                v1 = s1[old_id] if old_id in s1 else []
+                v2 = s2[old_id] if old_id in s2 else []
+                changed[old_id] = (v1, v2)
 
     # Filter by tolerance
     if progress_callback: progress_callback(90, "Filtering by tolerance...")
@@ -1671,8 +1935,10 @@ def run_compare(file1_bytes, file2_bytes, tolerances_py=None, progress_callback=
     for sec in diffs:
         if sec in renames and renames[sec]:
             # Add header
-            if sec in headers and "New Name" not in headers[sec]:
-                headers[sec].insert(1, "New Name")
+            # Headers may be shared SECTION_HEADERS tuples; build a new list
+            h = headers.get(sec)
+            if h is not None and "New Name" not in h:
+                headers[sec] = [*h[:1], "New Name", *h[1:]]
 
     # Detect geometry-only changes (coordinates changed but attributes didn't)
     geometry_changes = {"nodes": [], "links": [], "subs": []}
@@ -1730,30 +1996,30 @@ def run_compare(file1_bytes, file2_bytes, tolerances_py=None, progress_callback=
     # Inject computed slope column for CONDUITS
     if "CONDUITS" in diffs:
         if "CONDUITS" in headers:
-            headers["CONDUITS"].append("Slope")
+            headers["CONDUITS"] = [*headers["CONDUITS"], "Slope"]
         
         d = diffs["CONDUITS"]
 
-        def fmt_slope(val):
-            return f"{val:.6f}" if val is not None else ""
+        # Every added, removed and changed row gets a Slope value. Parsed rows
+        # may be shared with the parse cache, so slope goes on row copies.
+        def with_slope(vals: List[str]) -> List[str]:
+            s = _calculate_slope(vals, None)
+            return [*vals, f"{s:.6f}" if s is not None else ""]
 
+        c1 = dict(pr1.sections.get("CONDUITS", _EMPTY_MAP))
+        c2 = dict(pr2.sections.get("CONDUITS", _EMPTY_MAP))
         for rid in d.added:
-            vals = pr2.sections["CONDUITS"][rid]
-            s = _calculate_slope(vals, pr2.sections)
-            vals.append(fmt_slope(s))
-            
+            c2[rid] = with_slope(c2[rid])
         for rid in d.removed:
-            vals = pr1.sections["CONDUITS"][rid]
-            s = _calculate_slope(vals, pr1.sections)
-            vals.append(fmt_slope(s))
-
-            
-        for rid in d.changed:
-            old_vals, new_vals = d.changed[rid]
-            s1 = _calculate_slope(old_vals, pr1.sections)
-            s2 = _calculate_slope(new_vals, pr2.sections)
-            old_vals.append(fmt_slope(s1))
-            new_vals.append(fmt_slope(s2))
+            c1[rid] = with_slope(c1[rid])
+        for rid, (old_vals, new_vals) in d.changed.items():
+            old_vals, new_vals = with_slope(old_vals), with_slope(new_vals)
+            d.changed[rid] = (old_vals, new_vals)
+            if rid in c1: c1[rid] = old_vals
+            if rid in c2: c2[rid] = new_vals
+
+        if "CONDUITS" in pr1.sections: pr1.sections["CONDUITS"] = c1
+        if "CONDUITS" in pr2.sections: pr2.sections["CONDUITS"] = c2
     
     # Section-level summary
     summary_rows = [
@@ -1761,48 +2027,8 @@ def run_compare(file1_bytes, file2_bytes, tolerances_py=None, progress_callback=
         for s, d in diffs.items()
     ]
 
-    # Build rich diff payload
-    diffs_json = {}
-    for sec, d in diffs.items():
-        s1 = pr1.sections.get(sec, {})
-        s2 = pr2.sections.get(sec, {})
-        
-        has_new_name_col = sec in headers and "New Name" in headers[sec]
-        
-        def get_vals(source, rid, is_file2=False):
-            vals = source.get(rid, []) or []
-            if has_new_name_col:
-                # Pad with "NA" for Added/Removed items
-                vals = list(vals)
-                vals.insert(0, "NA")
-            return vals
-
-        changed_json = {}
-        for rid in d.changed:
-            old_vals_orig, new_vals_orig = d.changed[rid]
-            
-            # Compute diffs on original values (before column injection)
-            field_diffs = _calculate_field_diffs(old_vals_orig, new_vals_orig, headers.get(sec, []), sec, pr1.sections, pr2.sections)
-
-            # Inject "New Name" column
-            if has_new_name_col:
-                new_name_val = renames.get(sec, {}).get(rid, "NA")
-                v1_disp = [new_name_val] + old_vals_orig
-                v2_disp = [new_name_val] + new_vals_orig
-            else:
-                v1_disp = old_vals_orig
-                v2_disp = new_vals_orig
-                
-            changed_json[rid] = {
-                "values": [v1_disp, v2_disp],
-                "diff_values": field_diffs
-            }
-
-        diffs_json[sec] = {
-            "added":   { rid: get_vals(s2, rid, True) for rid in d.added },
-            "removed": { rid: get_vals(s1, rid, False) for rid in d.removed },
-            "changed": changed_json
-        }
+    # Rich diff payload; each section is built only when it is serialized
+    diffs_json = _LazyDiffJson(diffs, pr1.sections, pr2.sections, headers, renames, include_full)
 
     # Expose full hydrograph data for drill-down UI
     hydrographs = {
@@ -1822,14 +2048,14 @@ def run_compare(file1_bytes, file2_bytes, tolerances_py=None, progress_callback=
         "headers": headers,
         "renames": renames,
         "geometry": geom,
-        "sections1": pr1.sections,
-        "sections2": pr2.sections,
+        "sections1": _slim_sections(pr1.sections, diffs, 1),
+        "sections2": _slim_sections(pr2.sections, diffs, 2),
         "hydrographs": hydrographs,
         "tolerances": tolerances,
         "warnings": warnings,
         "geometry_changes": geometry_changes
     }
-    return json.dumps(out)
+    yield from _iter_payload(out)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -1846,8 +2072,12 @@ CRS_WKT = {
     "EPSG:2272": 'PROJCS["NAD83 / Pennsylvania South (ftUS)",GEOGCS["NAD83",DATUM["North_American_Datum_1983",SPHEROID["GRS 1980",6378137,298.257222101,AUTHORITY["EPSG","7019"]],AUTHORITY["EPSG","6269"]],PRIMEM["Greenwich",0,AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4269"]],PROJECTION["Lambert_Conformal_Conic_2SP"],PARAMETER["standard_parallel_1",40.96666666666667],PARAMETER["standard_parallel_2",39.93333333333333],PARAMETER["latitude_of_origin",39.33333333333334],PARAMETER["central_meridian",-77.75],PARAMETER["false_easting",1968500.000000001],PARAMETER["false_northing",0],UNIT["US survey foot",0.3048006096012192,AUTHORITY["EPSG","9003"]],AXIS["X",EAST],AXIS["Y",NORTH],AUTHORITY["EPSG","2272"]]',
 }
 
-def generate_shapefiles_zip(diffs_json_str: str, geometry_json_str: str, crs_id: str = None, file_prefix: str = "export") -> bytes:
-    """Generate a ZIP archive containing point/line/polygon shapefiles from comparison results."""
+def generate_shapefiles_zip(diffs_json_str: str, geometry_json_str: str, crs_id: str = None, file_prefix: str = "export",
+                            include_unchanged: bool = False) -> bytes:
+    """Generate a ZIP archive containing point/line/polygon shapefiles from comparison results.
+
+    Only added/removed/changed elements are exported unless ``include_unchanged`` is set.
+    """
     try:
         diffs_full = json.loads(diffs_json_str)
         # The 'diffs' key inside the full output holds the actual diffs
@@ -1874,40 +2104,33 @@ def generate_shapefiles_zip(diffs_json_str: str, geometry_json_str: str, crs_id:
                 dbf_fields = []
                 
                 seen_dbf_names = set(["ID", "Status"])
+                name_counters = {}  # default candidate -> next collision number
+
+                def unique_name(base, tag):
+                    """Return a unique <=10-char DBF name; collisions get a running number."""
+                    key = base[:8] + tag
+                    n = name_counters.get(key, 0)
+                    cand = key
+                    if n:
+                        cand = base[:8 - len(str(n))] + str(n) + tag
+                    while cand in seen_dbf_names:
+                        n += 1
+                        cand = base[:8 - len(str(n))] + str(n) + tag
+                    name_counters[key] = n + 1
+                    seen_dbf_names.add(cand)
+                    return cand
                 
                 for sec in section_names:
-                    headers = SECTION_HEADERS.get(sec, [])
-                    val_headers = headers[1:] if headers else []
+                    val_headers = SECTION_HEADERS.get(sec, _EMPTY)[1:]
                     
                     for h in val_headers:
                         if h in fields_map:
                             continue
                             
-                        safe_h = re.sub(r'[^a-zA-Z0-9]', '', h)
-                        base_candidate = safe_h[:8]
-                        # Old field
-                        cand_o = base_candidate + "_1"
-                        suffix = 1
-                        orig_cand_o = cand_o
-                        while cand_o in seen_dbf_names:
-                            suffix_str = str(suffix)
-                            cand_o = orig_cand_o[:10-len(suffix_str)] + suffix_str
-                            suffix += 1
-                        seen_dbf_names.add(cand_o)
-                        dbf_fields.append((cand_o, f"OLD:{h}", "C", 100, 0))
-                        
-                        # New field
-                        cand_n = base_candidate + "_2"
-                        suffix = 1
-                        orig_cand_n = cand_n
-                        while cand_n in seen_dbf_names:
-                            suffix_str = str(suffix)
-                            cand_n = orig_cand_n[:10-len(suffix_str)] + suffix_str
-                            suffix += 1
-                        seen_dbf_names.add(cand_n)
-                        dbf_fields.append((cand_n, f"NEW:{h}", "C", 100, 0))
-                        
-                        fields_map[h] = base_candidate
+                        safe_h = _RE_NON_ALNUM.sub('', h)
+                        dbf_fields.append((unique_name(safe_h, "_1"), f"OLD:{h}", "C", 100, 0))
+                        dbf_fields.append((unique_name(safe_h, "_2"), f"NEW:{h}", "C", 100, 0))
+                        fields_map[h] = safe_h[:8]
 
                 # Diff fields
                 diff_keys = set()
@@ -1916,25 +2139,15 @@ def generate_shapefiles_zip(diffs_json_str: str, geometry_json_str: str, crs_id:
                         diff_keys.update(diff_map.keys())
                 
                 for h in sorted(diff_keys):
-                    safe_h = re.sub(r'[^a-zA-Z0-9]', '', h)
-                    candidate = safe_h[:8] + "_D"
-                    
-                    # Ensure uniqueness
-                    original_candidate = candidate
-                    suffix = 1
-                    while candidate in seen_dbf_names:
-                        suffix_str = str(suffix)
-                        base_len = 10 - len(suffix_str)
-                        candidate = original_candidate[:base_len] + suffix_str
-                        suffix += 1
-                        
-                    seen_dbf_names.add(candidate)
+                    safe_h = _RE_NON_ALNUM.sub('', h)
+                    candidate = unique_name(safe_h, "_D")
                     fields_map[f"DIFF:{h}"] = candidate
                     dbf_fields.append((candidate, f"DIFF:{h}", "N", 18, 5))
                         
                 return dbf_fields
 
-            def write_shapefile(name, shape_type, records, coords_lookup1, coords_lookup2, dbf_fields):
+            def build_shapefile(name, shape_type, records, coords_lookup1, coords_lookup2, dbf_fields):
+                """Render one layer to in-memory .shp/.shx/.dbf bytes; None if it has no records."""
                 
                 shpio = io.BytesIO()
                 shxio = io.BytesIO()
@@ -1949,6 +2162,18 @@ def generate_shapefiles_zip(diffs_json_str: str, geometry_json_str: str, crs_id:
                 for i, (dbf_name, orig_header, ftype, flen, fdec) in enumerate(dbf_fields):
                     w.field(dbf_name, ftype, flen, fdec)
                     header_to_dbf_idx[orig_header] = i
+
+                # Blank record, copied per row
+                rec_template = [0 if ftype == "N" else "" for _, _, ftype, _, _ in dbf_fields]
+
+                # Section -> (OLD column indices, NEW column indices), by value position
+                section_cols = {}
+                for sec in {r[2] for r in records}:
+                    val_headers = SECTION_HEADERS.get(sec, _EMPTY)[1:]
+                    section_cols[sec] = (
+                        [header_to_dbf_idx.get(f"OLD:{h}") for h in val_headers],
+                        [header_to_dbf_idx.get(f"NEW:{h}") for h in val_headers],
+                    )
                 
                 count = 0
                 for eid, status, section, old_values, new_values, diff_map in records:
@@ -1969,65 +2194,42 @@ def generate_shapefiles_zip(diffs_json_str: str, geometry_json_str: str, crs_id:
                         # coords is [(x, y), ...]
                         w.line([coords])
                     elif shape_type == shapefile.POLYGON:
-                        clean_rings = []
-                        for ring in coords:
-                            if not ring: continue
-                            if ring[0] != ring[-1]:
-                                ring.append(ring[0])
-                            clean_rings.append(ring)
+                        # Close open rings without mutating the source geometry
+                        clean_rings = [ring if ring[0] == ring[-1] else ring + ring[:1]
+                                       for ring in coords if ring]
                         
                         if clean_rings:
                             w.poly(clean_rings)
                     
                     # Build attribute record
-                    rec_vals = []
-                    for _, _, ftype, _, _ in dbf_fields:
-                        if ftype == "N":
-                            rec_vals.append(0)
-                        else:
-                            rec_vals.append("")
-                    
+                    rec_vals = rec_template.copy()
+                    old_cols, new_cols = section_cols[section]
+
                     # Map old/new values to DBF columns
-                    headers = SECTION_HEADERS.get(section, [])
-                    val_headers = headers[1:] if headers else []
-                    
-                    for i, val in enumerate(old_values):
-                        if i < len(val_headers):
-                            h = val_headers[i]
-                            lookup_key = f"OLD:{h}"
-                            if lookup_key in header_to_dbf_idx:
-                                idx = header_to_dbf_idx[lookup_key]
-                                rec_vals[idx] = str(val)
+                    for idx, val in zip(old_cols, old_values):
+                        if idx is not None:
+                            rec_vals[idx] = val if val.__class__ is str else str(val)
 
-                    for i, val in enumerate(new_values):
-                        if i < len(val_headers):
-                            h = val_headers[i]
-                            lookup_key = f"NEW:{h}"
-                            if lookup_key in header_to_dbf_idx:
-                                idx = header_to_dbf_idx[lookup_key]
-                                rec_vals[idx] = str(val)
+                    for idx, val in zip(new_cols, new_values):
+                        if idx is not None:
+                            rec_vals[idx] = val if val.__class__ is str else str(val)
 
-                    # Map diff values
+                    # Map diff values (numeric columns: always hand pyshp a float)
                     if diff_map:
                         for k, v in diff_map.items():
                             lookup_key = f"DIFF:{k}"
                             if lookup_key in header_to_dbf_idx:
                                 idx = header_to_dbf_idx[lookup_key]
-                                rec_vals[idx] = v
+                                rec_vals[idx] = float(v) if v not in (None, "") else 0.0
                         
                     w.record(eid, status, *rec_vals)
                     count += 1
                     
                 w.close()
                 
-                if count > 0:
-                    zf.writestr(f"{name}.shp", shpio.getvalue())
-                    zf.writestr(f"{name}.shx", shxio.getvalue())
-                    zf.writestr(f"{name}.dbf", dbfio.getvalue())
-                    
-            # Write .prj if CRS is known
-                    if crs_id and crs_id in CRS_WKT:
-                        zf.writestr(f"{name}.prj", CRS_WKT[crs_id])
+                if count == 0:
+                    return None
+                return name, shpio.getvalue(), shxio.getvalue(), dbfio.getvalue()
 
             # --- Prepare Data ---
             
@@ -2035,7 +2237,7 @@ def generate_shapefiles_zip(diffs_json_str: str, geometry_json_str: str, crs_id:
             secs1 = full_out.get("sections1", {})
             secs2 = full_out.get("sections2", {})
             
-            def collect_records(section_names):
+            def collect_records(section_names, include_unchanged=False):
                 records = []
                 processed_ids = set()
                 
@@ -2044,13 +2246,13 @@ def generate_shapefiles_zip(diffs_json_str: str, geometry_json_str: str, crs_id:
                     s2 = secs2.get(sec, {})
                     d = diffs.get(sec, {})
                     
-                    added = set(d.get("added", {}).keys())
-                    removed = set(d.get("removed", {}).keys())
-                    changed = set(d.get("changed", {}).keys())
+                    # added/removed may be ID lists or {id: values} maps
+                    added = set(d.get("added", ()))
+                    removed = set(d.get("removed", ()))
+                    changed = set(d.get("changed", ()))
                     
                     def get_v(source, eid):
-                        v = source.get(eid, [])
-                        return v
+                        return source.get(eid, _EMPTY)
 
                     for eid in added:
                         if eid not in processed_ids:
@@ -2073,6 +2275,9 @@ def generate_shapefiles_zip(diffs_json_str: str, geometry_json_str: str, crs_id:
                             records.append((eid, "Changed", sec, get_v(s1, eid), get_v(s2, eid), diff_map))
                             processed_ids.add(eid)
                             
+                    if not include_unchanged:
+                        continue
+
                     for eid in s2:
                         if eid not in added and eid not in changed and eid not in processed_ids:
                             v = get_v(s2, eid)
@@ -2081,23 +2286,37 @@ def generate_shapefiles_zip(diffs_json_str: str, geometry_json_str: str, crs_id:
                             
                 return records
 
-            # Nodes
-            node_sections = ["JUNCTIONS", "OUTFALLS", "DIVIDERS", "STORAGE"]
-            node_records = collect_records(node_sections)
-            node_fields = get_dbf_fields(node_sections, node_records)
-            write_shapefile(f"nodes_{file_prefix}", shapefile.POINT, node_records, nodes1, nodes2, node_fields)
-            
-            # Links
-            link_sections = ["CONDUITS", "PUMPS", "ORIFICES", "WEIRS", "OUTLETS"]
-            link_records = collect_records(link_sections)
-            link_fields = get_dbf_fields(link_sections, link_records)
-            write_shapefile(f"links_{file_prefix}", shapefile.POLYLINE, link_records, links1, links2, link_fields)
-            
-            # Subcatchments
-            sub_sections = ["SUBCATCHMENTS"]
-            sub_records = collect_records(sub_sections)
-            sub_fields = get_dbf_fields(sub_sections, sub_records)
-            write_shapefile(f"subs_{file_prefix}", shapefile.POLYGON, sub_records, subs1, subs2, sub_fields)
+            def export_layer(name, shape_type, section_names, coords_lookup1, coords_lookup2):
+                records = collect_records(section_names, include_unchanged)
+                fields = get_dbf_fields(section_names, records)
+                return build_shapefile(name, shape_type, records, coords_lookup1, coords_lookup2, fields)
+
+            layers = [
+                # Nodes
+                (f"nodes_{file_prefix}", shapefile.POINT,
+                 ["JUNCTIONS", "OUTFALLS", "DIVIDERS", "STORAGE"], nodes1, nodes2),
+                # Links
+                (f"links_{file_prefix}", shapefile.POLYLINE,
+                 ["CONDUITS", "PUMPS", "ORIFICES", "WEIRS", "OUTLETS"], links1, links2),
+                # Subcatchments
+                (f"subs_{file_prefix}", shapefile.POLYGON,
+                 ["SUBCATCHMENTS"], subs1, subs2),
+            ]
+
+            for layer in layers:
+                built = export_layer(*layer)
+                if built is None:
+                    continue
+                name, shp_bytes, shx_bytes, dbf_bytes = built
+                # .shp/.shx are packed binary doubles that barely deflate; store
+                # them and spend the compression effort on the text-heavy .dbf
+                zf.writestr(f"{name}.shp", shp_bytes, compress_type=zipfile.ZIP_STORED)
+                zf.writestr(f"{name}.shx", shx_bytes, compress_type=zipfile.ZIP_STORED)
+                zf.writestr(f"{name}.dbf", dbf_bytes, compresslevel=3)
+                
+                # Write .prj if CRS is known
+                if crs_id and crs_id in CRS_WKT:
+                    zf.writestr(f"{name}.prj", CRS_WKT[crs_id], compresslevel=3)
             
     except Exception as e:
         import traceback
@@ -42,11 +42,15 @@ self.onmessage = async (ev) => {
         self.postMessage({ type: "progress", payload: `${text} (${pct.toFixed(0)}%)` });
       };
 
+      let chunks = null;
       try {
-        const out = core.run_compare(py_b1, py_b2, py_tolerances, progressCallback);
-        const jsOut = out.toString();
-        self.postMessage({ type: "result", payload: jsOut });
+        // Pull JSON fragments so Python never builds the whole result string
+        chunks = core.run_compare_iter(py_b1, py_b2, py_tolerances, progressCallback);
+        const parts = [];
+        for (const part of chunks) parts.push(part);
+        self.postMessage({ type: "result", payload: parts.join("") });
       } finally {
+        if (chunks) chunks.destroy();
         py_b1.destroy();
         py_b2.destroy();
         if (py_tolerances) py_tolerances.destroy();
@@ -62,9 +66,10 @@ self.onmessage = async (ev) => {
       const geometryJson = msg.geometry;
       const crs = msg.crs;
       const filePrefix = msg.filePrefix || "export";
+      const includeUnchanged = !!msg.includeUnchanged;
 
       try {
-        const zipBytes = core.generate_shapefiles_zip(diffsJson, geometryJson, crs, filePrefix);
+        const zipBytes = core.generate_shapefiles_zip(diffsJson, geometryJson, crs, filePrefix, includeUnchanged);
         // Convert PyProxy/bytes to JS Uint8Array
         const jsBytes = zipBytes.toJs();
         zipBytes.destroy();